@@ -11,23 +11,6 @@ THIS_DIRECTORY_NAME = os.path.dirname(
 sys.path.append(os.path.normpath(os.path.join(THIS_DIRECTORY_NAME, "..")))
 
 from ml4tc.utils import file_system_utils
-from ml4tc.utils import architecture_utils
-from ml4tc.machine_learning import neural_net
-from ml4tc.machine_learning import cnn_architecture
-
-BASE_OPTION_DICT_GRIDDED_SAT = {
-    cnn_architecture.INPUT_DIMENSIONS_KEY: numpy.array([380, 540, 3, 1], dtype=int),
-    cnn_architecture.NUM_LAYERS_BY_BLOCK_KEY: numpy.full(6, 2, dtype=int),
-    cnn_architecture.NUM_CHANNELS_KEY: numpy.array(
-        [8, 8, 16, 16, 32, 32, 64, 64, 128, 128, 256, 256], dtype=int
-    ),
-    cnn_architecture.DROPOUT_RATES_KEY: numpy.full(12, 0.0),
-    cnn_architecture.DROPOUT_MC_FLAGS_KEY: numpy.full(12, 0, dtype=bool),
-    cnn_architecture.ACTIVATION_FUNCTION_KEY: architecture_utils.RELU_FUNCTION_STRING,
-    cnn_architecture.ACTIVATION_FUNCTION_ALPHA_KEY: 0.2,
-    cnn_architecture.L2_WEIGHT_KEY: 0.0,
-    cnn_architecture.USE_BATCH_NORM_KEY: True,
-}
 
 """
 BASE_OPTION_DICT_SHIPS = {
@@ -48,26 +31,10 @@ BASE_OPTION_DICT_SHIPS = {
 """
 BASE_OPTION_DICT_SHIPS = None
 
-BASE_OPTION_DICT_DENSE = {
-    # cnn_architecture.NUM_NEURONS_KEY:
-    #     numpy.array([1428, 232, 38, 6, 1], dtype=int),
-    cnn_architecture.DROPOUT_RATES_KEY: numpy.array([0.5, 0.5, 0.5, 0.5, 0]),
-    cnn_architecture.DROPOUT_MC_FLAGS_KEY: numpy.full(5, 0, dtype=bool),
-    cnn_architecture.INNER_ACTIV_FUNCTION_KEY: architecture_utils.RELU_FUNCTION_STRING,
-    cnn_architecture.INNER_ACTIV_FUNCTION_ALPHA_KEY: 0.2,
-    cnn_architecture.OUTPUT_ACTIV_FUNCTION_KEY: architecture_utils.SIGMOID_FUNCTION_STRING,
-    cnn_architecture.OUTPUT_ACTIV_FUNCTION_ALPHA_KEY: 0.0,
-    cnn_architecture.L2_WEIGHT_KEY: 0.0,
-    cnn_architecture.USE_BATCH_NORM_KEY: True,
-    cnn_architecture.LAST_DROPOUT_BEFORE_ACTIV_KEY: True,
-}
-
 SECOND_LAST_LAYER_DROPOUT_RATES = numpy.linspace(0.1, 0.9, num=5, dtype=float)
 THIRD_LAST_LAYER_DROPOUT_RATES = numpy.linspace(0.1, 0.9, num=5, dtype=float)
 FOURTH_LAST_LAYER_DROPOUT_RATES = numpy.linspace(0.1, 0.9, num=5, dtype=float)
 
-METRIC_FUNCTION_LIST = list(neural_net.METRIC_DICT.values())
-
 OUTPUT_DIR_NAME = (
     "/scratch1/RDARCH/rda-ghpcs/Ryan.Lagerquist/ml4tc_models/"
     "crps_experiment01/templates"
@@ -80,9 +47,45 @@ def _run():
     This is effectively the main method.
     """
 
+    # These imports pull in TensorFlow, which takes several seconds; keeping
+    # them here means tools that merely import this module do not pay for it.
+    from ml4tc.utils import architecture_utils
+    from ml4tc.machine_learning import neural_net
+    from ml4tc.machine_learning import cnn_architecture
+
+    base_option_dict_gridded_sat = {
+        cnn_architecture.INPUT_DIMENSIONS_KEY: numpy.array([380, 540, 3, 1], dtype=int),
+        cnn_architecture.NUM_LAYERS_BY_BLOCK_KEY: numpy.full(6, 2, dtype=int),
+        cnn_architecture.NUM_CHANNELS_KEY: numpy.array(
+            [8, 8, 16, 16, 32, 32, 64, 64, 128, 128, 256, 256], dtype=int
+        ),
+        cnn_architecture.DROPOUT_RATES_KEY: numpy.full(12, 0.0),
+        cnn_architecture.DROPOUT_MC_FLAGS_KEY: numpy.full(12, 0, dtype=bool),
+        cnn_architecture.ACTIVATION_FUNCTION_KEY: architecture_utils.RELU_FUNCTION_STRING,
+        cnn_architecture.ACTIVATION_FUNCTION_ALPHA_KEY: 0.2,
+        cnn_architecture.L2_WEIGHT_KEY: 0.0,
+        cnn_architecture.USE_BATCH_NORM_KEY: True,
+    }
+
+    base_option_dict_dense = {
+        # cnn_architecture.NUM_NEURONS_KEY:
+        #     numpy.array([1428, 232, 38, 6, 1], dtype=int),
+        cnn_architecture.DROPOUT_RATES_KEY: numpy.array([0.5, 0.5, 0.5, 0.5, 0]),
+        cnn_architecture.DROPOUT_MC_FLAGS_KEY: numpy.full(5, 0, dtype=bool),
+        cnn_architecture.INNER_ACTIV_FUNCTION_KEY: architecture_utils.RELU_FUNCTION_STRING,
+        cnn_architecture.INNER_ACTIV_FUNCTION_ALPHA_KEY: 0.2,
+        cnn_architecture.OUTPUT_ACTIV_FUNCTION_KEY: architecture_utils.SIGMOID_FUNCTION_STRING,
+        cnn_architecture.OUTPUT_ACTIV_FUNCTION_ALPHA_KEY: 0.0,
+        cnn_architecture.L2_WEIGHT_KEY: 0.0,
+        cnn_architecture.USE_BATCH_NORM_KEY: True,
+        cnn_architecture.LAST_DROPOUT_BEFORE_ACTIV_KEY: True,
+    }
+
+    metric_function_list = list(neural_net.METRIC_DICT.values())
+
     file_system_utils.mkdir_recursive_if_necessary(directory_name=OUTPUT_DIR_NAME)
 
-    d = BASE_OPTION_DICT_GRIDDED_SAT
+    d = base_option_dict_gridded_sat
 
     num_flattened_features = 40 * d[cnn_architecture.NUM_CHANNELS_KEY][-1]
     exp_neuron_counts = architecture_utils.get_dense_layer_dimensions(
@@ -93,11 +96,11 @@ def _run():
     )[1]
     neuron_counts = numpy.linspace(1, exp_neuron_counts[0], num=5, dtype=int)[::-1]
 
-    option_dict_dense = copy.deepcopy(BASE_OPTION_DICT_DENSE)
+    option_dict_dense = copy.deepcopy(base_option_dict_dense)
     option_dict_dense[cnn_architecture.NUM_NEURONS_KEY] = neuron_counts
 
     model_object = cnn_architecture.create_crps_model_ri(
-        option_dict_gridded_sat=BASE_OPTION_DICT_GRIDDED_SAT,
+        option_dict_gridded_sat=base_option_dict_gridded_sat,
         option_dict_ungridded_sat=None,
         option_dict_ships=BASE_OPTION_DICT_SHIPS,
         option_dict_dense=option_dict_dense,
@@ -109,7 +112,9 @@ def _run():
     file_system_utils.mkdir_recursive_if_necessary(file_name=model_file_name)
 
     print('Writing model to: "{0:s}"...'.format(model_file_name))
-    model_object.save(filepath=model_file_name, overwrite=True, include_optimizer=True)
+    model_object.save(
+        filepath=model_file_name, overwrite=True, include_optimizer=False
+    )
 
     model_metafile_name = neural_net.find_metafile(
         model_file_name=model_file_name, raise_error_if_missing=False
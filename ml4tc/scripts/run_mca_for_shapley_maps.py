@@ -1,12 +1,22 @@
 """Runs MCA (maximum-covariance analysis) for maps of Shapley values."""
 
 import os
-import copy
 import shutil
 import argparse
 import numpy
 import xarray
-from sklearn.decomposition import IncrementalPCA
+import dask.array
+
+try:
+    import cupy
+except ImportError:
+    cupy = None
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
 from gewittergefahr.gg_utils import error_checking
 from gewittergefahr.gg_utils import file_system_utils
 from ml4tc.machine_learning import saliency
@@ -18,6 +28,7 @@ SEPARATOR_STRING = '\n\n' + '*' * 50 + '\n\n'
 
 LAG_TIME_INDEX = -1
 CHANNEL_INDEX = 0
+GEMM_BLOCK_SIZE = 4096
 
 PRINCIPAL_COMPONENT_DIM = 'principal_component'
 GRID_ROW_DIM = 'grid_row'
@@ -34,12 +45,13 @@ REGRESSED_PREDICTOR_KEY = 'regressed_predictor'
 
 SHAPLEY_FILES_ARG_NAME = 'input_shapley_file_names'
 COVARIANCE_FILE_ARG_NAME = 'input_covariance_file_name'
+CONVERT_COVARIANCE_FILE_ARG_NAME = 'convert_covariance_file_to_zarr'
 OUTPUT_FILE_ARG_NAME = 'output_file_name'
 
 SHAPLEY_FILES_HELP_STRING = (
     'List of paths to Shapley files, each containing Shapley values for a '
     'different set of examples (one example = one TC at one time).  These '
-    'files will be read by `saliency.read_file`.'
+    'files will be read by `_read_shapley_file`.'
 )
 COVARIANCE_FILE_HELP_STRING = (
     'Path to covariance file.  This should contain the P-by-P covariance '
@@ -47,6 +59,10 @@ COVARIANCE_FILE_HELP_STRING = (
     'created by the script get_shap_predictor_covariance_matrix.py, using the '
     'exact same Shapley files.'
 )
+CONVERT_COVARIANCE_FILE_HELP_STRING = (
+    'Boolean flag.  If 1 and the covariance file is NetCDF, will rewrite it '
+    'as zarr and delete the original.  If 0, will just read the file.'
+)
 OUTPUT_FILE_HELP_STRING = (
     'Path to output file (zarr format).  Parameters of the fitted MCA will be '
     'written here by `_write_mca_results`.'
@@ -61,57 +77,139 @@ INPUT_ARG_PARSER.add_argument(
     '--' + COVARIANCE_FILE_ARG_NAME, type=str, required=True,
     help=COVARIANCE_FILE_HELP_STRING
 )
+INPUT_ARG_PARSER.add_argument(
+    '--' + CONVERT_COVARIANCE_FILE_ARG_NAME, type=int, required=False,
+    default=0, help=CONVERT_COVARIANCE_FILE_HELP_STRING
+)
 INPUT_ARG_PARSER.add_argument(
     '--' + OUTPUT_FILE_ARG_NAME, type=str, required=True,
     help=OUTPUT_FILE_HELP_STRING
 )
 
 
-def _read_covariance_matrix(covariance_file_name):
+if numba is None:
+    def _normalize_values_in_place(values, mean_value, stdev_value):
+        """Normalizes values to z-scores in place.
+
+        :param values: 1-D numpy array of data values.
+        :param mean_value: Mean value to subtract.
+        :param stdev_value: Standard deviation to divide by.
+        """
+
+        values -= mean_value
+        values /= stdev_value
+else:
+    @numba.njit(parallel=True, fastmath=True)
+    def _normalize_values_in_place(values, mean_value, stdev_value):
+        """Same as the pure-NumPy version but JIT-compiled and threaded."""
+
+        for i in numba.prange(values.size):
+            values[i] = (values[i] - mean_value) / stdev_value
+
+
+def _read_shapley_file(shapley_file_name):
+    """Reads one lag time and channel of gridded-satellite Shapley values.
+
+    Unlike `saliency.read_file`, this reads only the slab used by this script,
+    instead of materializing every variable in the file.
+
+    E = number of examples
+    M = number of rows in grid
+    N = number of columns in grid
+
+    :param shapley_file_name: Path to input file (NetCDF or zarr).
+    :return: dummy_input_grad_matrix: E-by-M-by-N numpy array of Shapley
+        values.
+    :return: dummy_saliency_matrix: E-by-M-by-N numpy array of dummy saliency
+        values.
+    """
+
+    # TODO(thunderhoser): This is HACK to deal with change from NetCDF to zarr.
+    if (
+            shapley_file_name.endswith('.nc')
+            and not os.path.isfile(shapley_file_name)
+    ):
+        shapley_file_name = '{0:s}.zarr'.format(shapley_file_name[:-3])
+
+    if (
+            shapley_file_name.endswith('.zarr')
+            and not os.path.isdir(shapley_file_name)
+    ):
+        shapley_file_name = '{0:s}.nc'.format(shapley_file_name[:-5])
+
+    if shapley_file_name.endswith('.zarr'):
+        saliency_table_xarray = xarray.open_zarr(shapley_file_name)
+    else:
+        saliency_table_xarray = xarray.open_dataset(
+            shapley_file_name, chunks={}
+        )
+
+    index_dict = {
+        saliency.SATELLITE_LAG_TIME_KEY: LAG_TIME_INDEX,
+        saliency.GRIDDED_SATELLITE_CHANNEL_KEY: CHANNEL_INDEX
+    }
+
+    dummy_input_grad_matrix = saliency_table_xarray[
+        saliency.GRIDDED_SATELLITE_INPUT_GRAD_KEY
+    ].isel(index_dict).values.astype(numpy.float32, copy=False)
+
+    dummy_saliency_matrix = saliency_table_xarray[
+        saliency.GRIDDED_SATELLITE_SALIENCY_KEY
+    ].isel(index_dict).values.astype(numpy.float32, copy=False)
+
+    return dummy_input_grad_matrix, dummy_saliency_matrix
+
+
+def _read_covariance_matrix(covariance_file_name, convert_to_zarr=False):
     """Reads covariance matrix from NetCDF or (ideally) zarr file.
 
     P = number of pixels
 
     :param covariance_file_name: Path to input file.
+    :param convert_to_zarr: Boolean flag.  If True and the input file is
+        NetCDF, will rewrite it as zarr and delete the original file.
     :return: covariance_matrix: P-by-P numpy array of covariances, where the
         [i, j] element is the covariance between normalized Shapley value at the
         [i]th pixel and normalized predictor value at the [j]th pixel.
     """
 
     # TODO(thunderhoser): This is HACK to deal with change from NetCDF to zarr.
-    if (
-            covariance_file_name.endswith('.nc')
-            and not os.path.isfile(covariance_file_name)
-    ):
+    file_extension = os.path.splitext(covariance_file_name)[1]
+
+    if file_extension == '.nc' and not os.path.isfile(covariance_file_name):
         covariance_file_name = '{0:s}.zarr'.format(covariance_file_name[:-3])
+        file_extension = '.zarr'
 
-    if (
-            covariance_file_name.endswith('.zarr')
-            and not os.path.isdir(covariance_file_name)
-    ):
+    if file_extension == '.zarr' and not os.path.isdir(covariance_file_name):
         covariance_file_name = '{0:s}.nc'.format(covariance_file_name[:-5])
+        file_extension = '.nc'
+
+    if file_extension == '.zarr':
 
-    if covariance_file_name.endswith('.zarr'):
-        return xarray.open_zarr(covariance_file_name)[
+        # chunks=None reads each stored chunk exactly once with plain zarr,
+        # rather than wrapping the array in dask and rechunking it.
+        return xarray.open_zarr(covariance_file_name, chunks=None)[
             get_covar_matrix.COVARIANCE_KEY
-        ].values
+        ].values.astype(numpy.float32, copy=False)
 
-    if not covariance_file_name.endswith('.nc'):
+    if file_extension != '.nc':
         return None
 
     covariance_matrix = xarray.open_dataset(covariance_file_name)[
         get_covar_matrix.COVARIANCE_KEY
-    ].values
+    ].values.astype(numpy.float32, copy=False)
 
-    netcdf_file_name = copy.deepcopy(covariance_file_name)
     zarr_file_name = '{0:s}.zarr'.format(covariance_file_name[:-3])
 
-    print('Writing covariance matrix to: "{0:s}"...'.format(zarr_file_name))
-    get_covar_matrix._write_results(
-        zarr_file_name=zarr_file_name, covariance_matrix=covariance_matrix
-    )
+    if convert_to_zarr and not os.path.isdir(zarr_file_name):
+        print('Writing covariance matrix to: "{0:s}"...'.format(
+            zarr_file_name
+        ))
+        get_covar_matrix._write_results(
+            zarr_file_name=zarr_file_name, covariance_matrix=covariance_matrix
+        )
 
-    os.remove(netcdf_file_name)
+        os.remove(covariance_file_name)
 
     return covariance_matrix
 
@@ -156,16 +254,29 @@ def _write_mca_results(
     num_grid_columns = regressed_shapley_matrix.shape[2]
     num_pixels = num_grid_rows * num_grid_columns
 
-    pc_indices = numpy.linspace(
-        0, num_principal_components - 1, num=num_principal_components, dtype=int
+    pc_indices = numpy.arange(num_principal_components, dtype=int)
+    row_indices = numpy.arange(num_grid_rows, dtype=int)
+    column_indices = numpy.arange(num_grid_columns, dtype=int)
+    pixel_indices = numpy.arange(num_pixels, dtype=int)
+
+    singular_value_chunks = (num_pixels, min([num_principal_components, 64]))
+    regressed_chunks = (1, num_grid_rows, num_grid_columns)
+
+    # Wrapping the big arrays in dask -- with chunks matching the zarr
+    # encoding below -- lets to_zarr compress and write the chunks in
+    # parallel instead of serializing everything through one thread.
+    shapley_singular_value_matrix = dask.array.from_array(
+        shapley_singular_value_matrix, chunks=singular_value_chunks
+    )
+    predictor_singular_value_matrix = dask.array.from_array(
+        predictor_singular_value_matrix, chunks=singular_value_chunks
     )
-    row_indices = numpy.linspace(
-        0, num_grid_rows - 1, num=num_grid_rows, dtype=int
+    regressed_shapley_matrix = dask.array.from_array(
+        regressed_shapley_matrix, chunks=regressed_chunks
     )
-    column_indices = numpy.linspace(
-        0, num_grid_columns - 1, num=num_grid_columns, dtype=int
+    regressed_predictor_matrix = dask.array.from_array(
+        regressed_predictor_matrix, chunks=regressed_chunks
     )
-    pixel_indices = numpy.linspace(0, num_pixels - 1, num=num_pixels, dtype=int)
 
     metadata_dict = {
         PRINCIPAL_COMPONENT_DIM: pc_indices,
@@ -210,49 +321,56 @@ def _write_mca_results(
     )
 
     encoding_dict = {
-        SHAPLEY_SINGULAR_VALUE_KEY: {'dtype': 'float32'},
-        PREDICTOR_SINGULAR_VALUE_KEY: {'dtype': 'float32'},
+        SHAPLEY_SINGULAR_VALUE_KEY: {
+            'dtype': 'float32', 'chunks': singular_value_chunks
+        },
+        PREDICTOR_SINGULAR_VALUE_KEY: {
+            'dtype': 'float32', 'chunks': singular_value_chunks
+        },
         SHAPLEY_EXPANSION_COEFF_KEY: {'dtype': 'float32'},
         PREDICTOR_EXPANSION_COEFF_KEY: {'dtype': 'float32'},
         EIGENVALUE_KEY: {'dtype': 'float32'},
-        REGRESSED_SHAPLEY_VALUE_KEY: {'dtype': 'float32'},
-        REGRESSED_PREDICTOR_KEY: {'dtype': 'float32'}
+        REGRESSED_SHAPLEY_VALUE_KEY: {
+            'dtype': 'float32', 'chunks': regressed_chunks
+        },
+        REGRESSED_PREDICTOR_KEY: {
+            'dtype': 'float32', 'chunks': regressed_chunks
+        }
     }
     mca_table_xarray.to_zarr(
         store=zarr_file_name, mode='w', encoding=encoding_dict
     )
 
 
-def _run(shapley_file_names, covariance_file_name, output_file_name):
+def _run(shapley_file_names, covariance_file_name,
+         convert_covariance_file_to_zarr, output_file_name):
     """Runs MCA (maximum-covariance analysis) for maps of Shapley values.
 
     This is effectively the same method.
 
     :param shapley_file_names: See documentation at top of file.
     :param covariance_file_name: Same.
+    :param convert_covariance_file_to_zarr: Same.
     :param output_file_name: Same.
     """
 
     print('Reading data from: "{0:s}"...'.format(covariance_file_name))
-    covariance_matrix = _read_covariance_matrix(covariance_file_name)
+    covariance_matrix = _read_covariance_matrix(
+        covariance_file_name=covariance_file_name,
+        convert_to_zarr=convert_covariance_file_to_zarr
+    )
     num_covariance_pixels = covariance_matrix.shape[0]
 
-    shapley_matrix = None
-    norm_predictor_matrix = None
+    shapley_matrices = []
+    norm_predictor_matrices = []
     spatial_coarsening_factor = None
 
     # TODO(thunderhoser): Ensure matching saliency metadata for input files.
     for this_file_name in shapley_file_names:
         print('Reading data from: "{0:s}"...'.format(this_file_name))
-        this_saliency_dict = saliency.read_file(this_file_name)
-
-        this_dummy_input_grad_matrix = this_saliency_dict[
-            saliency.THREE_INPUT_GRAD_KEY
-        ][0][..., LAG_TIME_INDEX, CHANNEL_INDEX]
-
-        this_dummy_saliency_matrix = this_saliency_dict[
-            saliency.THREE_SALIENCY_KEY
-        ][0][..., LAG_TIME_INDEX, CHANNEL_INDEX]
+        this_dummy_input_grad_matrix, this_dummy_saliency_matrix = (
+            _read_shapley_file(this_file_name)
+        )
 
         if spatial_coarsening_factor is None:
             num_orig_pixels = (
@@ -278,40 +396,60 @@ def _run(shapley_file_names, covariance_file_name, output_file_name):
             :, ::spatial_coarsening_factor, ::spatial_coarsening_factor
         ]
 
-        this_predictor_matrix = numpy.divide(
-            this_dummy_input_grad_matrix, this_dummy_saliency_matrix
+        this_predictor_matrix = numpy.zeros_like(this_dummy_input_grad_matrix)
+        numpy.divide(
+            this_dummy_input_grad_matrix, this_dummy_saliency_matrix,
+            out=this_predictor_matrix,
+            where=this_dummy_saliency_matrix != 0
         )
-        this_predictor_matrix[
-            numpy.invert(numpy.isfinite(this_predictor_matrix))
-        ] = 0.
-
-        this_shapley_matrix = this_dummy_input_grad_matrix
-
-        if shapley_matrix is None:
-            shapley_matrix = this_shapley_matrix + 0.
-            norm_predictor_matrix = this_predictor_matrix + 0.
-        else:
-            shapley_matrix = numpy.concatenate(
-                (shapley_matrix, this_shapley_matrix), axis=0
-            )
-            norm_predictor_matrix = numpy.concatenate(
-                (norm_predictor_matrix, this_predictor_matrix), axis=0
-            )
+
+        # Dividing by a tiny but nonzero denominator can still overflow to
+        # inf, which the where clause above does not catch.
+        numpy.nan_to_num(
+            this_predictor_matrix, copy=False, posinf=0., neginf=0.
+        )
+
+        # The coarsened slab is a strided view into the full-resolution
+        # array; copying it lets the full-resolution array be freed now
+        # instead of surviving until the final concatenate.
+        shapley_matrices.append(
+            numpy.ascontiguousarray(this_dummy_input_grad_matrix)
+        )
+        norm_predictor_matrices.append(this_predictor_matrix)
+
+    shapley_matrix = numpy.concatenate(shapley_matrices, axis=0)
+    del shapley_matrices
+
+    norm_predictor_matrix = numpy.concatenate(norm_predictor_matrices, axis=0)
+    del norm_predictor_matrices
 
     print(SEPARATOR_STRING)
 
-    mean_shapley_value = numpy.mean(shapley_matrix)
-    stdev_shapley_value = numpy.std(shapley_matrix, ddof=1)
-    norm_shapley_matrix = (
-        (shapley_matrix - mean_shapley_value) / stdev_shapley_value
+    # The matrices stay float32, but the reductions must accumulate in
+    # float64: squaring large finite quotients (e.g., from near-zero
+    # saliency values) overflows a float32 variance to inf, which would
+    # turn the whole downstream pipeline into NaN.
+    mean_shapley_value = numpy.mean(shapley_matrix, dtype=numpy.float64)
+    stdev_shapley_value = numpy.std(
+        shapley_matrix, ddof=1, dtype=numpy.float64
+    )
+    _normalize_values_in_place(
+        numpy.ravel(shapley_matrix), mean_shapley_value, stdev_shapley_value
     )
+    norm_shapley_matrix = shapley_matrix
     del shapley_matrix
 
-    mean_predictor_value = numpy.mean(norm_predictor_matrix)
-    stdev_predictor_value = numpy.std(norm_predictor_matrix, ddof=1)
-    double_norm_predictor_matrix = (
-        (norm_predictor_matrix - mean_predictor_value) / stdev_predictor_value
+    mean_predictor_value = numpy.mean(
+        norm_predictor_matrix, dtype=numpy.float64
+    )
+    stdev_predictor_value = numpy.std(
+        norm_predictor_matrix, ddof=1, dtype=numpy.float64
     )
+    _normalize_values_in_place(
+        numpy.ravel(norm_predictor_matrix),
+        mean_predictor_value, stdev_predictor_value
+    )
+    double_norm_predictor_matrix = norm_predictor_matrix
     del norm_predictor_matrix
 
     num_examples = norm_shapley_matrix.shape[0]
@@ -325,86 +463,149 @@ def _run(shapley_file_names, covariance_file_name, output_file_name):
         double_norm_predictor_matrix, these_dim
     )
 
-    print('Running PCA...')
-    pca_object = IncrementalPCA(n_components=num_examples, whiten=False)
-    pca_object.fit(covariance_matrix)
-
-    predictor_singular_value_matrix = numpy.transpose(pca_object.components_)
-    eigenvalues = pca_object.singular_values_ ** 2
+    # The dense linear algebra below is the hotspot.  If cupy is installed,
+    # move the big matrices to GPU once, run every GEMM and the
+    # eigendecomposition there, and copy the results back before writing.
+    if cupy is None:
+        xp = numpy
+    else:
+        xp = cupy
+        covariance_matrix = cupy.asarray(covariance_matrix)
+        norm_shapley_matrix = cupy.asarray(norm_shapley_matrix)
+        double_norm_predictor_matrix = cupy.asarray(
+            double_norm_predictor_matrix
+        )
 
+    # The cross-covariance matrix (Shapley x predictor) is not symmetric in
+    # general, so this must be an SVD rather than a symmetric
+    # eigendecomposition.  SVD returns singular values in descending order.
+    #
+    # IncrementalPCA, which this replaces, centered its input before
+    # decomposing it -- so subtract the column means first to reproduce the
+    # baseline results, then add them back, because the products below need
+    # the raw covariance matrix.
+    print('Running PCA...')
+    column_mean_matrix = xp.mean(
+        covariance_matrix, axis=0, keepdims=True, dtype=numpy.float64
+    ).astype(covariance_matrix.dtype)
+
+    covariance_matrix -= column_mean_matrix
+    singular_values, vt_matrix = xp.linalg.svd(
+        covariance_matrix, full_matrices=False
+    )[1:]
+    covariance_matrix += column_mean_matrix
+    del column_mean_matrix
+
+    eigenvalues = singular_values[:num_examples] ** 2
+    predictor_singular_value_matrix = xp.transpose(vt_matrix[:num_examples])
+    del singular_values, vt_matrix
+
+    # Multiply the covariance matrix by the eigenvectors in row blocks, so
+    # that each block of the product reuses the eigenvector matrix while it
+    # is still in cache.  The covariance matrix itself is far too big to fit.
     print('Computing left singular vectors (for Shapley values)...')
-    first_matrix = numpy.dot(
-        covariance_matrix, predictor_singular_value_matrix
+    first_matrix = xp.empty(
+        (num_covariance_pixels, predictor_singular_value_matrix.shape[1]),
+        dtype=covariance_matrix.dtype
+    )
+
+    for i in range(0, num_covariance_pixels, GEMM_BLOCK_SIZE):
+        first_matrix[i:(i + GEMM_BLOCK_SIZE)] = xp.dot(
+            covariance_matrix[i:(i + GEMM_BLOCK_SIZE)],
+            predictor_singular_value_matrix
+        )
+    shapley_singular_value_matrix = (
+        first_matrix / xp.sqrt(eigenvalues)[xp.newaxis, :]
     )
-    second_matrix = numpy.linalg.inv(numpy.diag(numpy.sqrt(eigenvalues)))
-    shapley_singular_value_matrix = numpy.dot(first_matrix, second_matrix)
 
     del covariance_matrix
 
     print('Computing expansion coefficients...')
-    shapley_expansion_coeff_matrix = numpy.dot(
+    shapley_expansion_coeff_matrix = xp.dot(
         norm_shapley_matrix, shapley_singular_value_matrix
     )
-    predictor_expansion_coeff_matrix = numpy.dot(
+    predictor_expansion_coeff_matrix = xp.dot(
         double_norm_predictor_matrix, predictor_singular_value_matrix
     )
 
+    # As above, accumulate the statistics in float64, then cast back to
+    # float32 so the standardized matrices (and the regression GEMMs fed by
+    # them) stay single-precision.
     print('Standardizing expansion coefficients...')
-    these_means = numpy.mean(
-        shapley_expansion_coeff_matrix, axis=0, keepdims=True
-    )
-    these_stdevs = numpy.std(
-        shapley_expansion_coeff_matrix, ddof=1, axis=0, keepdims=True
-    )
+    these_means = xp.mean(
+        shapley_expansion_coeff_matrix, axis=0, keepdims=True,
+        dtype=numpy.float64
+    ).astype(numpy.float32)
+    these_stdevs = xp.std(
+        shapley_expansion_coeff_matrix, ddof=1, axis=0, keepdims=True,
+        dtype=numpy.float64
+    ).astype(numpy.float32)
     shapley_expansion_coeff_matrix = (
         (shapley_expansion_coeff_matrix - these_means) / these_stdevs
     )
 
-    these_means = numpy.mean(
-        predictor_expansion_coeff_matrix, axis=0, keepdims=True
-    )
-    these_stdevs = numpy.std(
-        predictor_expansion_coeff_matrix, ddof=1, axis=0, keepdims=True
-    )
+    these_means = xp.mean(
+        predictor_expansion_coeff_matrix, axis=0, keepdims=True,
+        dtype=numpy.float64
+    ).astype(numpy.float32)
+    these_stdevs = xp.std(
+        predictor_expansion_coeff_matrix, ddof=1, axis=0, keepdims=True,
+        dtype=numpy.float64
+    ).astype(numpy.float32)
     predictor_expansion_coeff_matrix = (
         (predictor_expansion_coeff_matrix - these_means) / these_stdevs
     )
 
+    # Store the coefficient matrices in Fortran order, so that the transposes
+    # fed to the GEMMs below are contiguous and BLAS need not repack them.
+    shapley_expansion_coeff_matrix = xp.asfortranarray(
+        shapley_expansion_coeff_matrix
+    )
+    predictor_expansion_coeff_matrix = xp.asfortranarray(
+        predictor_expansion_coeff_matrix
+    )
+
     print('Regressing Shapley values onto each left singular vector...')
-    regressed_shapley_matrix = numpy.full((num_examples, num_pixels), numpy.nan)
+    regressed_shapley_matrix = xp.dot(
+        xp.transpose(shapley_expansion_coeff_matrix), norm_shapley_matrix
+    ) / num_examples
 
-    for i in range(num_examples):
-        this_matrix = numpy.dot(
-            numpy.transpose(norm_shapley_matrix),
-            shapley_expansion_coeff_matrix[:, [i]]
-        )
-        regressed_shapley_matrix[i, :] = (
-            numpy.squeeze(this_matrix) / num_examples
-        )
+    del norm_shapley_matrix
 
     print('Regressing predictor values onto each right singular vector...')
-    regressed_predictor_matrix = numpy.full(
-        (num_examples, num_pixels), numpy.nan
-    )
+    regressed_predictor_matrix = xp.dot(
+        xp.transpose(predictor_expansion_coeff_matrix),
+        double_norm_predictor_matrix
+    ) / num_examples
 
-    for i in range(num_examples):
-        this_matrix = numpy.dot(
-            numpy.transpose(double_norm_predictor_matrix),
-            predictor_expansion_coeff_matrix[:, [i]]
-        )
-        regressed_predictor_matrix[i, :] = (
-            numpy.squeeze(this_matrix) / num_examples
-        )
+    del double_norm_predictor_matrix
 
-    regressed_shapley_matrix = numpy.reshape(
+    regressed_shapley_matrix = xp.reshape(
         regressed_shapley_matrix,
         (num_examples, num_grid_rows, num_grid_columns)
     )
-    regressed_predictor_matrix = numpy.reshape(
+    regressed_predictor_matrix = xp.reshape(
         regressed_predictor_matrix,
         (num_examples, num_grid_rows, num_grid_columns)
     )
 
+    if cupy is not None:
+        shapley_singular_value_matrix = cupy.asnumpy(
+            shapley_singular_value_matrix
+        )
+        predictor_singular_value_matrix = cupy.asnumpy(
+            predictor_singular_value_matrix
+        )
+        shapley_expansion_coeff_matrix = cupy.asnumpy(
+            shapley_expansion_coeff_matrix
+        )
+        predictor_expansion_coeff_matrix = cupy.asnumpy(
+            predictor_expansion_coeff_matrix
+        )
+        eigenvalues = cupy.asnumpy(eigenvalues)
+        regressed_shapley_matrix = cupy.asnumpy(regressed_shapley_matrix)
+        regressed_predictor_matrix = cupy.asnumpy(regressed_predictor_matrix)
+
     print('Writing results to: "{0:s}"...'.format(output_file_name))
     _write_mca_results(
         zarr_file_name=output_file_name,
@@ -426,5 +627,8 @@ if __name__ == '__main__':
         covariance_file_name=getattr(
             INPUT_ARG_OBJECT, COVARIANCE_FILE_ARG_NAME
         ),
+        convert_covariance_file_to_zarr=bool(getattr(
+            INPUT_ARG_OBJECT, CONVERT_COVARIANCE_FILE_ARG_NAME
+        )),
         output_file_name=getattr(INPUT_ARG_OBJECT, OUTPUT_FILE_ARG_NAME)
     )
@@ -30,6 +30,7 @@ PACKAGE_REQUIREMENTS = [
     'scikit-learn',
     'scikit-image',
     'netCDF4',
+    'dask',
     'pyproj',
     'opencv-python',
     'matplotlib',